@@ -1,61 +1,218 @@
-import google.generativeai as genai
+"""Gemini-backed criteria extraction.
+
+Calls are made through the async client so a slow LLM round-trip never
+blocks the event loop; run uvicorn/gunicorn with more than one worker
+(see start.sh) to also spread CPU-bound work across cores.
+
+Cache misses arriving within a short window are coalesced into a single
+Gemini request that returns one criteria object per query.
+"""
+import asyncio
 import re
-import json
+import sys
 import os
 import cachetools
+import orjson
+from collections import deque
+
+_FENCE_RE = re.compile(r'```json|```')
+_WORD_RE = re.compile(r'[a-z0-9]+')
+# Filler words that never change criteria; qualifiers like 'under', 'least', 'most', 'not' stay
+_STOPWORDS = frozenset({
+    'a', 'an', 'the', 'on', 'in', 'of', 'for', 'with', 'who', 'that', 'are', 'is',
+    'me', 'i', 'find', 'show', 'some', 'please', 'want', 'need', 'looking'
+})
+
+def _content_tokens(text: str) -> tuple:
+    """Word tokens of a normalized query in order, plurals folded and stopwords dropped"""
+    return tuple(
+        word[:-1] if len(word) > 3 and word.endswith('s') and not word.endswith('ss') else word
+        for word in _WORD_RE.findall(text) if word not in _STOPWORDS
+    )
+
+def _shingles(text: str) -> frozenset:
+    """Character trigrams of a normalized query"""
+    return frozenset(text[i:i + 3] for i in range(max(len(text) - 2, 1)))
 
 class GeminiService:
+    # Prompt is split around the numbered queries and their count so it is built by plain concatenation
+    _PROMPT_HEAD = "Extract influencer search criteria for each numbered query below:\n"
+    _PROMPT_COUNT = "\nReturn ONLY a JSON array with exactly "
+    _PROMPT_TAIL = """ objects, one per query, in the same order.
+Each object must have "id" set to its query's number and may contain these fields:
+{"id": integer, "category": "string", "content_type": "string", "platform": "string",
+ "min_followers": integer, "max_followers": integer, "min_engagement": float,
+ "max_budget": float, "age_range": [min, max], "gender": "string"}
+
+Special conversions:
+- "gen z" → [18, 25]
+- "millennial" → [26, 40]
+- "teen" → [13, 19]
+- "affordable" → max_budget: 7000
+- "premium" → max_budget: 20000
+
+Only include explicitly mentioned or strongly implied fields; give only the "id" for a query with none.
+"""
+    
     def __init__(self):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise RuntimeError("GEMINI_API_KEY environment variable not set")
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self._api_key = api_key
+        self._model = None
+        self._model_lock = asyncio.Lock()
         self.cache = cachetools.TTLCache(maxsize=1000, ttl=int(os.getenv("CACHE_TTL", 300)))
+        # Pre-bound accessors: one lookup on the hot path instead of `in` + `[]`
+        self._cget = self.cache.__getitem__
+        self._cset = self.cache.__setitem__
+        
+        # Near-duplicate tier: recent (shingles, content tokens, cache_key) probed on exact misses
+        self.similarity_threshold = float(os.getenv("CACHE_SIMILARITY", 0.8))
+        self._recent = deque(maxlen=100)
+        
+        # Micro-batching: flush when batch_size queries are queued or after batch_window seconds
+        self.batch_size = int(os.getenv("GEMINI_BATCH_SIZE", 8))
+        self.batch_window = float(os.getenv("GEMINI_BATCH_WINDOW_MS", 20)) / 1000
+        self._pending = []
+        self._inflight = {}
+        self._wake = asyncio.Event()
+        self._flusher_task = None
+        self._batch_tasks = set()
+    
+    def _build_model(self):
+        """Import and configure the Gemini SDK (slow: pulls in grpc/protobuf/auth)"""
+        import google.generativeai as genai
+        genai.configure(api_key=self._api_key)
+        return genai.GenerativeModel('gemini-1.5-flash')
+    
+    async def get_model(self):
+        """Gemini model, built in a worker thread on first use so the event loop never stalls"""
+        if self._model is None:
+            async with self._model_lock:
+                if self._model is None:
+                    self._model = await asyncio.to_thread(self._build_model)
+        return self._model
     
-    def extract_criteria(self, user_input: str) -> dict:
+    async def extract_criteria(self, user_input: str) -> dict:
         """Extract search criteria with caching"""
-        cache_key = f"criteria_{user_input.lower().strip()}"
+        # Interned so repeat lookups hit the identity fast path in dict comparison
+        cache_key = sys.intern(user_input.strip().casefold())
+        if not cache_key:
+            return {}
         
         # Check cache first
-        if cache_key in self.cache:
-            return self.cache[cache_key]
-            
         try:
-            prompt = f"""
-            Extract influencer search criteria from: "{user_input}"
-            Return ONLY JSON with these possible fields:
-            {{
-                "category": "string",
-                "content_type": "string",
-                "platform": "string",
-                "min_followers": integer,
-                "max_followers": integer,
-                "min_engagement": float,
-                "max_budget": float,
-                "age_range": [min, max],
-                "gender": "string"
-            }}
-            
-            Special conversions:
-            - "gen z" → [18, 25]
-            - "millennial" → [26, 40]
-            - "teen" → [13, 19]
-            - "affordable" → max_budget: 7000
-            - "premium" → max_budget: 20000
-            
-            Only include explicitly mentioned or strongly implied fields.
-            """
-            
-            response = self.model.generate_content(prompt)
-            json_str = response.text.strip()
-            json_str = re.sub(r'```json|```', '', json_str).strip()
-            
-            criteria = json.loads(json_str) if json_str and json_str != "{}" else {}
-            
-            # Cache result
-            self.cache[cache_key] = criteria
+            return self._cget(cache_key)
+        except KeyError:
+            pass
+        
+        criteria = self._similar(cache_key)
+        if criteria is not None:
             return criteria
+        
+        # Shield so one cancelled request does not cancel a future shared with others
+        return await asyncio.shield(self._submit(user_input, cache_key))
+    
+    def _similar(self, cache_key: str):
+        """Return cached criteria of a recent query that is a near-duplicate of cache_key"""
+        shingles = _shingles(cache_key)
+        tokens = _content_tokens(cache_key)
+        for other_shingles, other_tokens, other_key in reversed(self._recent):
+            # A single differing or moved word (micro/macro, least/most, "over 100k ... under
+            # 50000" vs "under 100k ... over 50000") can flip a range the AI alone extracts, so
+            # the ordered tokens must match; only plural/filler differences are tolerated
+            if other_tokens != tokens:
+                continue
+            if len(shingles & other_shingles) >= self.similarity_threshold * len(shingles | other_shingles):
+                try:
+                    return self._cget(other_key)
+                except KeyError:
+                    continue
+        return None
+    
+    def _submit(self, user_input: str, cache_key: str) -> asyncio.Future:
+        """Queue a query for the next batch, sharing any identical in-flight query"""
+        if cache_key in self._inflight:
+            return self._inflight[cache_key]
+        
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._inflight[cache_key] = future
+        self._pending.append((user_input, cache_key, future))
+        
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+        if self._flusher_task is None or self._flusher_task.done():
+            self._flusher_task = loop.create_task(self._flusher())
+        return future
+    
+    async def _flusher(self):
+        """Drain the pending queue in batches, exiting once it is empty"""
+        while self._pending:
+            if len(self._pending) < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.batch_window)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            
+            batch = self._pending[:self.batch_size]
+            del self._pending[:self.batch_size]
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+    
+    async def _run_batch(self, batch: list):
+        """Send one Gemini request for the batch and scatter results to waiters"""
+        results = None
+        try:
+            model = await self.get_model()
         except Exception as e:
-            print(f"Gemini error: {e}")
-            return {}
+            print(f"Gemini SDK load error: {e}")
+        else:
+            try:
+                results = await self._generate(model, [user_input for user_input, _, _ in batch])
+            except Exception as e:
+                print(f"Gemini error: {e}")
+        
+        for i, (_, cache_key, future) in enumerate(batch):
+            del self._inflight[cache_key]
+            if results is None or results[i] is None:
+                criteria = {}
+            else:
+                criteria = results[i]
+                self._cset(cache_key, criteria)
+                self._recent.append((_shingles(cache_key), _content_tokens(cache_key), cache_key))
+            if not future.done():
+                future.set_result(criteria)
+    
+    async def _generate(self, model, queries: list) -> list:
+        """Ask Gemini for criteria for each query, returning a dict (or None if unusable) per query"""
+        numbered = "\n".join(f"{i}. {orjson.dumps(query).decode()}" for i, query in enumerate(queries, 1))
+        prompt = self._PROMPT_HEAD + numbered + self._PROMPT_COUNT + str(len(queries)) + self._PROMPT_TAIL
+        
+        response = await model.generate_content_async(prompt)
+        json_str = response.text.strip()
+        json_str = _FENCE_RE.sub('', json_str).strip()
+        
+        results = orjson.loads(json_str) if json_str else []
+        if not isinstance(results, list):
+            raise ValueError(f"expected a JSON array, got {json_str[:200]!r}")
+        
+        # Scatter by the echoed query number, never by array position; objects whose id is
+        # missing, out of range or repeated are dropped so no query gets another's criteria
+        by_id = [None] * len(queries)
+        seen = set()
+        for item in results:
+            if not isinstance(item, dict):
+                continue
+            query_id = item.pop('id', None)
+            if type(query_id) is not int or not 1 <= query_id <= len(queries):
+                continue
+            by_id[query_id - 1] = None if query_id in seen else item
+            seen.add(query_id)
+        
+        dropped = by_id.count(None)
+        if dropped:
+            print(f"Gemini error: no usable result for {dropped} of {len(queries)} queries")
+        return by_id
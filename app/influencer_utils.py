@@ -1,36 +1,76 @@
+import numpy as np
 import pandas as pd
 import os
 import re
 from typing import Dict, Any, Tuple
 
+CSV_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_influencers_100_inr.csv")
+# Bump whenever the cleaning in load_data changes so stale feather caches are ignored
+CACHE_VERSION = 2
+
+AGE_RE = re.compile(r'under (\d+)|over (\d+)|(\d+)\s*-\s*(\d+)|(\d+)\s*to\s*(\d+)|below (\d+)|above (\d+)')
+
+GENDER_MAP = {
+    'female': 'female', 'woman': 'female', 'women': 'female', 'girl': 'female',
+    'she': 'female', 'her': 'female',
+    'male': 'male', 'man': 'male', 'men': 'male', 'boy': 'male', 'he': 'male', 'him': 'male'
+}
+PLATFORM_MAP = {
+    'instagram': 'ig', 'youtube': 'yt', 'facebook': 'fb', 'tiktok': 'tiktok',
+    'ig': 'ig', 'insta': 'ig', 'yt': 'yt', 'fb': 'fb'
+}
+CATEGORY_MAP = {
+    'fitness': 'fitness', 'fit': 'fitness', 'workout': 'fitness',
+    'gym': 'fitness', 'exercise': 'fitness',
+    'tech': 'tech', 'technology': 'tech', 'gadgets': 'tech',
+    'fashion': 'fashion', 'style': 'fashion', 'clothing': 'fashion',
+    'food': 'food', 'cooking': 'food', 'cuisine': 'food', 'recipe': 'food',
+    'travel': 'travel', 'tourism': 'travel', 'adventure': 'travel'
+}
+
+def _alternation(keywords) -> str:
+    """Regex alternation of keywords, longest first so 'fitness' wins over 'fit'"""
+    return '|'.join(re.escape(kw) for kw in sorted(keywords, key=len, reverse=True))
+
+# One pass over the input finds gender, platform and category keywords; the named
+# group that matched tells which field it belongs to. Every keyword must start a
+# word, and gender words are short pronouns so they must also end one ('he' not in 'the').
+KEYWORD_MAPS = {'gender': GENDER_MAP, 'platform': PLATFORM_MAP, 'category': CATEGORY_MAP}
+# Position of each keyword in its table; the earliest-listed match wins, as in the table scans
+KEYWORD_RANKS = {field: {kw: i for i, kw in enumerate(keywords)} for field, keywords in KEYWORD_MAPS.items()}
+KEYWORD_RE = re.compile(
+    rf'\b(?P<gender>{_alternation(GENDER_MAP)})s?\b'
+    rf'|\b(?P<platform>{_alternation(PLATFORM_MAP)})'
+    rf'|\b(?P<category>{_alternation(CATEGORY_MAP)})'
+)
+
 class InfluencerUtils:
     def __init__(self):
         self.df = self.load_data()
-        self.platform_map = {
-            'instagram': 'ig', 'youtube': 'yt', 'facebook': 'fb', 'tiktok': 'tiktok',
-            'ig': 'ig', 'insta': 'ig', 'yt': 'yt', 'fb': 'fb'
-        }
-        self.category_map = {
-            'fitness': 'fitness', 'fit': 'fitness', 'workout': 'fitness',
-            'gym': 'fitness', 'exercise': 'fitness',
-            'tech': 'tech', 'technology': 'tech', 'gadgets': 'tech',
-            'fashion': 'fashion', 'style': 'fashion', 'clothing': 'fashion',
-            'food': 'food', 'cooking': 'food', 'cuisine': 'food', 'recipe': 'food',
-            'travel': 'travel', 'tourism': 'travel', 'adventure': 'travel'
-        }
+        self.platform_map = PLATFORM_MAP
+        self.category_map = CATEGORY_MAP
+        self.index_columns()
     
     def load_data(self) -> pd.DataFrame:
-        """Load and clean influencer data"""
+        """Load and clean influencer data, reusing a cleaned feather copy when fresh"""
         try:
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            csv_path = os.path.join(current_dir, "mock_influencers_100_inr.csv")
-            df = pd.read_csv(csv_path)
+            cache_path = f"{CSV_PATH}.v{CACHE_VERSION}.feather"
             
-            # Clean data
-            str_cols = ['category', 'content_type', 'platform', 'gender', 'email', 'phone_number']
-            for col in str_cols:
+            if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(CSV_PATH):
+                df = pd.read_feather(cache_path, dtype_backend='pyarrow')
+            else:
+                df = pd.read_csv(CSV_PATH, engine='pyarrow', dtype_backend='pyarrow')
+                
+                # Clean data (Arrow string kernels, no per-cell Python objects)
+                # Only columns that are filtered on; contact fields keep their original formatting
+                str_cols = [col for col in ['category', 'content_type', 'platform', 'gender'] if col in df.columns]
+                df[str_cols] = df[str_cols].apply(lambda s: s.str.lower().str.strip())
+                self.write_cache(df, cache_path)
+            
+            # Low-cardinality filter columns compare on integer codes
+            for col in ['category', 'platform', 'gender']:
                 if col in df.columns:
-                    df[col] = df[col].astype(str).str.lower().str.strip()
+                    df[col] = df[col].astype('category')
             
             print(f"Loaded {len(df)} influencer records")
             return df
@@ -38,24 +78,106 @@ class InfluencerUtils:
             print(f"Data loading error: {e}")
             return pd.DataFrame()
     
+    def write_cache(self, df: pd.DataFrame, cache_path: str):
+        """Atomically write the cleaned frame so concurrent workers never read a partial file"""
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            df.to_feather(tmp_path)
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            print(f"Data cache write error: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def index_columns(self):
+        """Cache filter columns as ndarrays so searches skip DataFrame indexing"""
+        self.stats = None
+        if self.df.empty:
+            return
+        # Inverted indices: value -> sorted row positions
+        self._by_category = self.df.groupby('category', observed=True).indices
+        self._by_platform = self.df.groupby('platform', observed=True).indices
+        self._by_gender = self.df.groupby('gender', observed=True).indices
+        self._age = self.shared_column('age')
+        self._followers = self.shared_column('total_followers')
+        self._engagement = self.shared_column('overall_engagement')
+        self._rate = self.shared_column('rates_for_charging_inr')
+        self._records = self.build_records(self.df)
+        self.stats = self.build_stats(self.df)
+    
+    def build_stats(self, df: pd.DataFrame) -> dict:
+        """Dataset statistics served by /stats; recompute if the data is reloaded"""
+        return {
+            "total_influencers": len(df),
+            "gender_distribution": df['gender'].value_counts().to_dict(),
+            "platform_distribution": df['platform'].value_counts().to_dict(),
+            "category_distribution": df['category'].value_counts().to_dict(),
+            "follower_stats": {
+                "min": int(df['total_followers'].min()),
+                "max": int(df['total_followers'].max()),
+                "mean": int(df['total_followers'].mean())
+            }
+        }
+    
+    def shared_column(self, col: str) -> np.ndarray:
+        """Memory-map a float64 column from a .npy beside the CSV so workers share its pages"""
+        path = f"{CSV_PATH}.{col}.npy"
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(CSV_PATH):
+                values = np.load(path, mmap_mode='r')
+                if len(values) == len(self.df):
+                    return values
+            
+            with open(tmp_path, 'wb') as f:
+                np.save(f, self.df[col].to_numpy(dtype=np.float64))
+            os.replace(tmp_path, path)
+            return np.load(path, mmap_mode='r')
+        except Exception as e:
+            print(f"Shared column error for {col}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return self.df[col].to_numpy(dtype=np.float64)
+    
+    def build_records(self, df: pd.DataFrame) -> list:
+        """Convert every row to its JSON response shape once"""
+        return [
+            {
+                "name": row['influencer_name'],
+                "category": row['category'],
+                "content_type": row['content_type'],
+                "platform": row['platform'],
+                "followers": int(row['total_followers']),
+                "engagement": float(row['overall_engagement']),
+                "rate_inr": float(row['rates_for_charging_inr']),
+                "age": int(row['age']),
+                "gender": row['gender'],
+                "contact": {
+                    "email": row['email'],
+                    "phone": row['phone_number']
+                }
+            }
+            for row in df.to_dict(orient='records')
+        ]
+    
     def manual_criteria_parsing(self, user_input: str) -> Dict[str, Any]:
         """Manual parsing for critical fields"""
         criteria = {}
         user_input = user_input.lower()
         
-        # Gender detection
-        gender_keywords = {
-            'female': ['female', 'woman', 'women', 'girl', 'she', 'her'],
-            'male': ['male', 'man', 'men', 'boy', 'he', 'him']
-        }
-        for gender, keywords in gender_keywords.items():
-            if any(kw in user_input for kw in keywords):
-                criteria['gender'] = gender
-                break
+        # Gender, platform and category detection (keyword listed first in its table wins,
+        # not the first one mentioned: "men and women" is female, "travel or tech" is tech)
+        best = {}
+        for match in KEYWORD_RE.finditer(user_input):
+            field = match.lastgroup
+            keyword = match.group(field)
+            if field not in best or KEYWORD_RANKS[field][keyword] < KEYWORD_RANKS[field][best[field]]:
+                best[field] = keyword
+        for field, keyword in best.items():
+            criteria[field] = KEYWORD_MAPS[field][keyword]
         
         # Age extraction
-        age_pattern = r'under (\d+)|over (\d+)|(\d+)\s*-\s*(\d+)|(\d+)\s*to\s*(\d+)|below (\d+)|above (\d+)'
-        age_match = re.search(age_pattern, user_input)
+        age_match = AGE_RE.search(user_input)
         if age_match:
             if age_match.group(1):  # under X
                 criteria['age_range'] = [18, int(age_match.group(1))]
@@ -70,90 +192,77 @@ class InfluencerUtils:
             elif age_match.group(8):  # above X
                 criteria['age_range'] = [int(age_match.group(8)), 65]
         
-        # Platform mapping
-        for platform, code in self.platform_map.items():
-            if platform in user_input:
-                criteria['platform'] = code
-                break
-        
-        # Category mapping
-        for keyword, category in self.category_map.items():
-            if keyword in user_input:
-                criteria['category'] = category
-                break
-        
         return criteria
     
-    def search(self, criteria: Dict[str, Any]) -> Tuple[pd.DataFrame, str]:
-        """Search influencers with criteria"""
+    @staticmethod
+    def narrow(idx, index: dict, value) -> np.ndarray:
+        """Intersect current row positions with the rows matching value"""
+        positions = index.get(value, np.empty(0, dtype=np.intp))
+        return positions if idx is None else np.intersect1d(idx, positions, assume_unique=True)
+    
+    def search(self, criteria: Dict[str, Any]) -> Tuple[np.ndarray, str]:
+        """Search influencers with criteria, returning sorted row positions"""
         if self.df.empty:
-            return pd.DataFrame(), "Data not loaded"
+            return np.empty(0, dtype=np.intp), "Data not loaded"
         
-        results = self.df.copy()
+        idx = None
         applied_filters = []
         
-        # Apply filters
+        # Apply equality filters via the inverted indices
         if 'category' in criteria:
-            results = results[results['category'] == criteria['category']]
+            idx = self.narrow(idx, self._by_category, criteria['category'])
             applied_filters.append(f"category: {criteria['category']}")
             
         if 'platform' in criteria:
             platform_code = self.platform_map.get(criteria['platform'].lower(), criteria['platform'])
-            results = results[results['platform'] == platform_code]
+            idx = self.narrow(idx, self._by_platform, platform_code)
             applied_filters.append(f"platform: {platform_code}")
             
         if 'gender' in criteria:
-            results = results[results['gender'] == criteria['gender']]
+            idx = self.narrow(idx, self._by_gender, criteria['gender'])
             applied_filters.append(f"gender: {criteria['gender']}")
-            
+        
+        if idx is None:
+            idx = np.arange(len(self.df))
+        
+        # Apply range filters on the remaining rows only
+        mask = np.ones(len(idx), dtype=bool)
+        
         if 'age_range' in criteria and len(criteria['age_range']) == 2:
             min_age, max_age = criteria['age_range']
             min_age = max(18, min_age)
             max_age = min(65, max_age)
-            results = results[(results['age'] >= min_age) & (results['age'] <= max_age)]
+            age = self._age[idx]
+            mask &= (age >= min_age) & (age <= max_age)
             applied_filters.append(f"age: {min_age}-{max_age}")
             
         if 'min_followers' in criteria:
-            results = results[results['total_followers'] >= int(criteria['min_followers'])]
+            mask &= self._followers[idx] >= int(criteria['min_followers'])
             applied_filters.append(f"min followers: {criteria['min_followers']:,}")
             
         if 'max_followers' in criteria:
-            results = results[results['total_followers'] <= int(criteria['max_followers'])]
+            mask &= self._followers[idx] <= int(criteria['max_followers'])
             applied_filters.append(f"max followers: {criteria['max_followers']:,}")
             
         if 'min_engagement' in criteria:
-            results = results[results['overall_engagement'] >= float(criteria['min_engagement'])]
+            mask &= self._engagement[idx] >= float(criteria['min_engagement'])
             applied_filters.append(f"min engagement: {criteria['min_engagement']}%")
             
         if 'max_budget' in criteria:
-            results = results[results['rates_for_charging_inr'] <= float(criteria['max_budget'])]
+            mask &= self._rate[idx] <= float(criteria['max_budget'])
             applied_filters.append(f"max budget: ₹{criteria['max_budget']:,.2f}")
         
-        # Sort by engagement then followers
-        results = results.sort_values(by=['overall_engagement', 'total_followers'], ascending=False)
+        # Sort by engagement then followers, both descending
+        idx = idx[mask]
+        order = np.lexsort((-self._followers[idx], -self._engagement[idx]))
+        results = idx[order]
         
         return results, ", ".join(applied_filters) if applied_filters else "no filters"
     
-    def format_results(self, results: pd.DataFrame, limit: int) -> list:
+    def format_results(self, results: np.ndarray, limit: int) -> list:
         """Format results for JSON response"""
-        if results.empty:
-            return []
-        
-        influencers = []
-        for _, row in results.head(limit).iterrows():
-            influencers.append({
-                "name": row['influencer_name'],
-                "category": row['category'],
-                "content_type": row['content_type'],
-                "platform": row['platform'],
-                "followers": int(row['total_followers']),
-                "engagement": float(row['overall_engagement']),
-                "rate_inr": float(row['rates_for_charging_inr']),
-                "age": int(row['age']),
-                "gender": row['gender'],
-                "contact": {
-                    "email": row['email'],
-                    "phone": row['phone_number']
-                }
-            })
-        return influencers
+        return [self._records[i] for i in results[:limit]]
+
+if __name__ == "__main__":
+    # Prestart hook: build the feather and .npy caches once before workers fork
+    InfluencerUtils()
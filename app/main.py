@@ -1,7 +1,9 @@
 import os
+import asyncio
 import logging
 from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from .influencer_utils import InfluencerUtils
 from .gemini_service import GeminiService
 
@@ -14,7 +16,8 @@ app = FastAPI(
     description="AI-powered influencer search using natural language",
     version="1.2",
     docs_url="/docs",
-    redoc_url=None
+    redoc_url=None,
+    default_response_class=ORJSONResponse
 )
 
 # CORS configuration
@@ -48,20 +51,10 @@ def read_root():
 
 @app.get("/stats")
 def get_stats():
-    if utils.df.empty:
+    if utils.stats is None:
         raise HTTPException(status_code=500, detail="Data not loaded")
     
-    return {
-        "total_influencers": len(utils.df),
-        "gender_distribution": utils.df['gender'].value_counts().to_dict(),
-        "platform_distribution": utils.df['platform'].value_counts().to_dict(),
-        "category_distribution": utils.df['category'].value_counts().to_dict(),
-        "follower_stats": {
-            "min": int(utils.df['total_followers'].min()),
-            "max": int(utils.df['total_followers'].max()),
-            "mean": int(utils.df['total_followers'].mean())
-        }
-    }
+    return utils.stats
 
 @app.post("/search")
 async def search_influencers(
@@ -77,14 +70,17 @@ async def search_influencers(
     - "Affordable travel bloggers"
     """
     try:
-        # Step 1: Manual parsing for critical fields
-        manual_criteria = utils.manual_criteria_parsing(prompt)
-        
-        # Step 2: AI-based extraction
-        ai_criteria = gemini.extract_criteria(prompt)
+        # Step 1 & 2: Manual parsing for critical fields alongside AI-based extraction
+        manual_criteria, ai_criteria = await asyncio.gather(
+            asyncio.to_thread(utils.manual_criteria_parsing, prompt),
+            gemini.extract_criteria(prompt)
+        )
         
-        # Merge criteria (manual takes precedence)
-        criteria = {**ai_criteria, **manual_criteria}
+        # Merge criteria (manual takes precedence, but empty manual values keep the AI's)
+        criteria = dict(ai_criteria)
+        for key, value in manual_criteria.items():
+            if value:
+                criteria[key] = value
         
         # Step 3: Search influencers
         results, filters_applied = utils.search(criteria)
@@ -1,5 +1,8 @@
 #!/bin/bash
 # start.sh
+# Build the shared data caches once so every worker just maps them
+python -m app.influencer_utils
+
 exec gunicorn app.main:app \
   --workers 4 \
   --worker-class uvicorn.workers.UvicornWorker \